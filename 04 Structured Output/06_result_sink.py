@@ -0,0 +1,253 @@
+import os
+import random
+import time
+from enum import Enum
+from typing import get_args, get_origin
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pydantic import BaseModel, Field
+
+
+# --------------------------------------------------------------
+# Columnar Result Sink
+# --------------------------------------------------------------
+
+"""
+Dumping millions of results with model_dump() and writing them as JSON lines is slow and
+produces huge files: every row repeats the field names and every enum value in full.
+Instead, we buffer results column by column and flush them in batches to Arrow or Parquet:
+
+- enums (TicketCategory, CustomerSentiment) become dictionary-encoded columns
+- nested models and lists (steps, concepts, inventors) become nested list/struct columns
+- Arrow IPC files can be memory-mapped for analytics without loading them into memory
+"""
+
+
+def arrow_type(annotation) -> pa.DataType:
+    if get_origin(annotation) is list:
+        return pa.list_(arrow_type(get_args(annotation)[0]))
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        # Enums are stored as small integer codes pointing into a dictionary of values
+        return pa.dictionary(pa.int8(), pa.string())
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct(
+            [
+                (name, arrow_type(f.annotation))
+                for name, f in annotation.model_fields.items()
+            ]
+        )
+    return {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}[
+        annotation
+    ]
+
+
+def arrow_schema(model: type[BaseModel]) -> pa.Schema:
+    return pa.schema(
+        [(name, arrow_type(f.annotation)) for name, f in model.model_fields.items()]
+    )
+
+
+class ResultSink:
+    def __init__(self, path: str, model: type[BaseModel], batch_size: int = 50_000):
+        self.path = path
+        self.model = model
+        self.batch_size = batch_size
+        self.schema = arrow_schema(model)
+        self.columns = {name: [] for name in model.model_fields}
+        self.rows = 0
+        self.enums = {
+            name: list(f.annotation)
+            for name, f in model.model_fields.items()
+            if isinstance(f.annotation, type) and issubclass(f.annotation, Enum)
+        }
+        # A fixed dictionary per enum keeps the codes identical across batches
+        self.codes = {
+            name: {member: i for i, member in enumerate(members)}
+            for name, members in self.enums.items()
+        }
+        if path.endswith(".parquet"):
+            self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def append(self, result: BaseModel):
+        for name, values in self.columns.items():
+            value = getattr(result, name)
+            if name in self.codes:
+                value = self.codes[name][value]
+            elif isinstance(value, BaseModel):
+                value = value.model_dump()
+            elif isinstance(value, list) and value and isinstance(value[0], BaseModel):
+                value = [item.model_dump() for item in value]
+            values.append(value)
+        self.rows += 1
+        if self.rows >= self.batch_size:
+            self.flush()
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def flush(self):
+        if not self.rows:
+            return
+        arrays = []
+        for field in self.schema:
+            values = self.columns[field.name]
+            if field.name in self.enums:
+                dictionary = pa.array([m.value for m in self.enums[field.name]])
+                indices = pa.array(values, type=pa.int8())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        self.writer.write_batch(batch)
+        self.columns = {name: [] for name in self.columns}
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_results(path: str) -> pa.Table:
+    """Read results back, memory-mapped so the data is paged in lazily by the OS."""
+    if path.endswith(".parquet"):
+        return pq.read_table(path, memory_map=True)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+# --------------------------------------------------------------
+# Ticket System results
+# --------------------------------------------------------------
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(BaseModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+replies = [
+    "Thanks for reaching out! Could you share your invoice number so I can look into your bill?",
+    "I'm sorry to hear your order arrived damaged. We'll send a replacement right away.",
+    "Happy to help! Your order has shipped and should arrive within 3-5 business days.",
+]
+
+tickets = [
+    Ticket(
+        # A unique suffix, like real replies, so Parquet can't dictionary-encode the column
+        reply=f"{random.choice(replies)} (ref {random.randrange(10**8)})",
+        category=random.choice(list(TicketCategory)),
+        confidence=random.random(),
+        sentiment=random.choice(list(CustomerSentiment)),
+    )
+    for _ in range(200_000)
+]
+
+with ResultSink("tickets.arrow", Ticket) as sink:
+    sink.extend(tickets[:10])
+
+table = read_results("tickets.arrow")
+table.schema
+table.to_pylist()[0]
+
+# --------------------------------------------------------------
+# Nested results: steps and concepts
+# --------------------------------------------------------------
+
+
+class ArticleSummary(BaseModel):
+    invented_year: int
+    summary: str
+    inventors: list[str]
+    description: str
+
+    class Concept(BaseModel):
+        title: str
+        description: str
+
+    concepts: list[Concept]
+
+
+summaries = [
+    ArticleSummary(
+        invented_year=1989,
+        summary="A convolutional neural network is a feed-forward neural network that learns features via filter optimization.",
+        inventors=["Yann LeCun", "Kunihiko Fukushima"],
+        description="CNNs use shared-weight convolution kernels to process grid-like data such as images.",
+        concepts=[
+            ArticleSummary.Concept(
+                title="Convolution",
+                description="Sliding filters over the input to extract features.",
+            ),
+            ArticleSummary.Concept(
+                title="Pooling",
+                description="Downsampling feature maps to reduce dimensionality.",
+            ),
+        ],
+    )
+]
+
+with ResultSink("summaries.parquet", ArticleSummary) as sink:
+    sink.extend(summaries)
+
+read_results("summaries.parquet").column("concepts").to_pylist()
+
+# --------------------------------------------------------------
+# Benchmark: write throughput and file size versus JSONL
+# --------------------------------------------------------------
+
+
+def write_jsonl(path: str, results):
+    with open(path, "w") as f:
+        for result in results:
+            f.write(result.model_dump_json() + "\n")
+
+
+def write_sink(path: str, results):
+    with ResultSink(path, type(results[0])) as sink:
+        sink.extend(results)
+
+
+for path, write in [
+    ("tickets.jsonl", write_jsonl),
+    ("tickets.arrow", write_sink),
+    ("tickets.parquet", write_sink),
+]:
+    start = time.perf_counter()
+    write(path, tickets)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path) / 1024**2
+    print(f"{path:>16}: {len(tickets) / elapsed:>9,.0f} rows/s, {size:6.1f} MB")
+
+# Analytics on the memory-mapped file: counts per category and mean confidence
+table = read_results("tickets.arrow")
+pc.value_counts(table.column("category"))
+table.group_by("sentiment").aggregate([("confidence", "mean")])
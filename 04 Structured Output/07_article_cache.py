@@ -0,0 +1,213 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+import requests
+from bs4 import BeautifulSoup
+from openai import OpenAI
+from pydantic import BaseModel
+
+client = OpenAI()
+MODEL = "gpt-4o-2024-08-06"
+
+
+# --------------------------------------------------------------
+# Conditional-GET Article Cache
+# --------------------------------------------------------------
+
+"""
+get_article_content downloads and parses every page on every run. When we re-summarize the
+same corpus, most articles haven't changed. The cache below stores, per URL, the ETag and
+Last-Modified headers, the raw body and the extracted paragraph text:
+
+- the next request is conditional (If-None-Match / If-Modified-Since), a 304 skips the download
+- if the server sends the page again but the body hash is unchanged, parsing is skipped
+- summaries are indexed by the hash of the extracted text, the model and a hash of the prompt
+  and schema, so unchanged articles also skip get_article_summary
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT NOT NULL,
+    body BLOB NOT NULL,
+    text TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    text_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (text_hash, model, prompt_hash)
+);
+"""
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def extract_paragraphs(body: bytes) -> str:
+    soup = BeautifulSoup(body, "html.parser")
+    html_content = soup.find("div", class_="mw-parser-output")
+    return "\n".join(p.text for p in html_content.find_all("p"))
+
+
+class ArticleCache:
+    def __init__(self, path: str = "articles.db", timeout: tuple = (5, 30)):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        # Reuse connections across requests
+        self.session = requests.Session()
+        self.timeout = timeout
+        self.stats = {"not_modified": 0, "unchanged": 0, "parsed": 0}
+
+    def get_article_content(self, url: str) -> str:
+        cached = self.conn.execute(
+            "SELECT etag, last_modified, body_hash, text FROM pages WHERE url = ?",
+            (url,),
+        ).fetchone()
+
+        headers = {}
+        if cached:
+            etag, last_modified, body_hash, text = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if cached and response.status_code == 304:
+            self.stats["not_modified"] += 1
+            return text
+        response.raise_for_status()
+
+        new_hash = sha256(response.content)
+        if cached and new_hash == body_hash:
+            # The server ignored the validators, but the page is the same
+            self.stats["unchanged"] += 1
+            self.conn.execute(
+                "UPDATE pages SET etag = ?, last_modified = ?, fetched_at = ? WHERE url = ?",
+                (
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    time.time(),
+                    url,
+                ),
+            )
+            self.conn.commit()
+            return text
+
+        self.stats["parsed"] += 1
+        text = extract_paragraphs(response.content)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                new_hash,
+                response.content,
+                text,
+                time.time(),
+            ),
+        )
+        self.conn.commit()
+        return text
+
+    def get_summary(self, text: str, model: str, prompt_hash: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT summary FROM summaries WHERE text_hash = ? AND model = ? AND prompt_hash = ?",
+            (sha256(text.encode()), model, prompt_hash),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_summary(self, text: str, model: str, prompt_hash: str, summary: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+            (sha256(text.encode()), model, prompt_hash, summary),
+        )
+        self.conn.commit()
+
+
+cache = ArticleCache("articles.db")
+
+# --------------------------------------------------------------
+# Text summarization with the cache
+# --------------------------------------------------------------
+
+urls = [
+    # Article on CNNs
+    "https://en.wikipedia.org/wiki/Convolutional_neural_network",
+    # Article on LLMs
+    "https://wikipedia.org/wiki/Large_language_model",
+    # Article on MoE
+    "https://en.wikipedia.org/wiki/Mixture_of_experts",
+]
+
+summarization_prompt = """
+You will be provided with content from an article about an invention.
+Your goal will be to summarize the article following the schema provided.
+Here is a description of the parameters:
+- invented_year: year in which the invention discussed in the article was invented
+- summary: one sentence summary of what the invention is
+- inventors: array of strings listing the inventor full names if present, otherwise just surname
+- concepts: array of key concepts related to the invention, each concept containing a title and a description
+- description: short description of the invention
+"""
+
+
+class ArticleSummary(BaseModel):
+    invented_year: int
+    summary: str
+    inventors: list[str]
+    description: str
+
+    class Concept(BaseModel):
+        title: str
+        description: str
+
+    concepts: list[Concept]
+
+
+# Editing the prompt or the schema invalidates the cached summaries
+prompt_hash = sha256(
+    (
+        summarization_prompt
+        + json.dumps(ArticleSummary.model_json_schema(), sort_keys=True)
+    ).encode()
+)
+
+
+def get_article_summary(text: str) -> ArticleSummary:
+    cached = cache.get_summary(text, MODEL, prompt_hash)
+    if cached is not None:
+        return ArticleSummary.model_validate_json(cached)
+
+    completion = client.beta.chat.completions.parse(
+        model=MODEL,
+        temperature=0.2,
+        messages=[
+            {"role": "system", "content": summarization_prompt},
+            {"role": "user", "content": text},
+        ],
+        response_format=ArticleSummary,
+    )
+
+    summary = completion.choices[0].message.parsed
+    cache.set_summary(text, MODEL, prompt_hash, summary.model_dump_json())
+    return summary
+
+
+# The first run downloads, parses and summarizes every article,
+# the second run only sends conditional requests
+for run in range(2):
+    start = time.perf_counter()
+    content = [cache.get_article_content(url) for url in urls]
+    summaries = [get_article_summary(text) for text in content]
+    print(f"Run #{run + 1}: {time.perf_counter() - start:.2f}s, {cache.stats}")
@@ -0,0 +1,209 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+import instructor
+from openai import OpenAI
+from pydantic import BaseModel, Field
+
+client = OpenAI()
+MODEL = "gpt-4o-2024-08-06"
+SUMMARY_MODEL = "gpt-4o-mini"
+
+
+# --------------------------------------------------------------
+# Token-Bounded Conversation History
+# --------------------------------------------------------------
+
+"""
+Appending every turn to the messages list makes prompt tokens, and with them latency and cost,
+grow with each turn of a support chat. The Conversation below keeps a rolling token budget:
+
+- every message gets its token count once, when it is added, and the total is kept up to date,
+  so deciding what to drop is O(1) per turn
+- turns that fall out of the budget are summarized in the background by a smaller model,
+  the reply never waits for the summary
+- the summary is sent as a system message in front of the recent turns
+"""
+
+
+def count_tokens(message: dict) -> int:
+    # Roughly 4 characters per token, plus a few tokens of overhead per message
+    return len(message["content"]) // 4 + 4
+
+
+class Conversation:
+    def __init__(
+        self,
+        system_prompt: str,
+        budget: int = 2000,
+        keep_recent: int = 4,
+        summary_client: OpenAI = client,
+    ):
+        self.system = {"role": "system", "content": system_prompt}
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.summary_client = summary_client
+        self.turns: deque[tuple[dict, int]] = deque()
+        self.tokens = count_tokens(self.system)
+        self.summary = None
+        self.summary_tokens = 0
+        self._evicted: list[dict] = []
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1)
+        self._summarizing = False
+        self._pending = None
+
+    def add(self, role: str, content: str):
+        message = {"role": role, "content": content}
+        tokens = count_tokens(message)
+        with self._lock:
+            self.turns.append((message, tokens))
+            self.tokens += tokens
+            # Drop the oldest turns until we are within budget
+            while (
+                self.tokens + self.summary_tokens > self.budget
+                and len(self.turns) > self.keep_recent
+            ):
+                evicted, evicted_tokens = self.turns.popleft()
+                self.tokens -= evicted_tokens
+                self._evicted.append(evicted)
+        self._summarize_in_background()
+
+    def messages(self) -> list[dict]:
+        with self._lock:
+            messages = [self.system]
+            if self.summary:
+                messages.append(
+                    {
+                        "role": "system",
+                        "content": f"Summary of the earlier conversation:\n{self.summary}",
+                    }
+                )
+            messages.extend(message for message, _ in self.turns)
+            return messages
+
+    def _summarize_in_background(self):
+        with self._lock:
+            if not self._evicted or self._summarizing:
+                return
+            self._summarizing = True
+        self._pending = self._summarizer.submit(self._summarize_evicted)
+
+    def _summarize_evicted(self):
+        # Messages evicted while we were summarizing are picked up in the next round
+        while True:
+            with self._lock:
+                evicted, self._evicted = self._evicted, []
+                summary = self.summary
+                if not evicted:
+                    self._summarizing = False
+                    return
+            try:
+                new_summary = self._summarize(summary, evicted)
+            except Exception:
+                with self._lock:
+                    # Keep the messages for the next attempt
+                    self._evicted = evicted + self._evicted
+                    self._summarizing = False
+                raise
+            with self._lock:
+                self.summary = new_summary
+                self.summary_tokens = count_tokens({"content": new_summary})
+
+    def _summarize(self, summary: str | None, evicted: list[dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in evicted)
+        completion = self.summary_client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            temperature=0,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Update the summary of a customer support conversation with the new messages. Keep names, order numbers, amounts and open questions. Reply with the summary only.",
+                },
+                {
+                    "role": "user",
+                    "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}",
+                },
+            ],
+        )
+        return completion.choices[0].message.content
+
+    def chat(self, chat_client, user_message: str, **kwargs):
+        """Send a user message with the bounded history, works with the plain and Instructor client."""
+        self.add("user", user_message)
+        response = chat_client.chat.completions.create(
+            messages=self.messages(), **kwargs
+        )
+        if isinstance(response, BaseModel) and hasattr(response, "choices"):
+            content = response.choices[0].message.content
+        else:
+            # Instructor returns the response model, store it as the assistant's JSON
+            content = response.model_dump_json()
+        self.add("assistant", content)
+        return response
+
+    def wait(self):
+        """Block until the background summary is up to date, e.g. before saving the conversation."""
+        if self._pending:
+            self._pending.result()
+
+
+# --------------------------------------------------------------
+# Multi-turn support chat with client.chat.completions.create
+# --------------------------------------------------------------
+
+conversation = Conversation(
+    "You're a helpful customer care assistant.", budget=300, keep_recent=4
+)
+
+for message in [
+    "Hi, I ordered a pair of headphones last week, order #4821.",
+    "They arrived today but the left ear cup doesn't work.",
+    "I'd prefer a replacement over a refund if possible.",
+    "Can you ship it to my office instead? It's 12 Main Street.",
+    "Also, will I need to send the broken pair back first?",
+]:
+    completion = conversation.chat(client, message, model=MODEL)
+    print(completion.choices[0].message.content)
+    print(f"Prompt tokens: {completion.usage.prompt_tokens}\n")
+
+conversation.wait()
+conversation.summary
+
+# --------------------------------------------------------------
+# The same conversation with the Instructor-patched client
+# --------------------------------------------------------------
+
+instructor_client = instructor.from_openai(OpenAI())
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    RETURN = "return"
+    BILLING = "billing"
+
+
+class Reply(BaseModel):
+    content: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+
+
+conversation = Conversation(
+    "You're a helpful customer care assistant that can classify incoming messages and create a response.",
+    budget=300,
+)
+
+for message in [
+    "Hi, I have a question about my last invoice.",
+    "I was charged twice for the same order, #4821.",
+    "Can you refund the duplicate charge to my credit card?",
+]:
+    reply = conversation.chat(
+        instructor_client, message, model=MODEL, response_model=Reply
+    )
+    print(reply.category, reply.content)
@@ -0,0 +1,390 @@
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from enum import Enum
+
+import instructor
+from openai import OpenAI
+from pydantic import BaseModel, Field
+
+
+# --------------------------------------------------------------
+# Durable Ticket Queue Example
+# --------------------------------------------------------------
+
+"""
+Messages are written to a local SQLite database (WAL mode) before they are processed,
+so a crash never loses in-flight work. A consumer pool claims messages with a lease,
+calls process_ticket concurrently and commits the results in batched transactions.
+
+- At-least-once: a message whose lease expires (e.g. the worker crashed) is claimed again
+- Idempotent: every message is keyed by its source and source message id, so a redelivered
+  message is enqueued and stored at most once
+- Dead letters: messages that run out of attempts are marked failed with their last error
+  and can be replayed
+"""
+
+client = instructor.from_openai(OpenAI())
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(BaseModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+def process_ticket(customer_message: str) -> Ticket:
+    reply = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        response_model=Ticket,
+        max_retries=3,
+        messages=[
+            {
+                "role": "system",
+                "content": "Analyze the incoming customer message and predict the values for the ticket.",
+            },
+            {"role": "user", "content": customer_message},
+        ],
+    )
+
+    return reply
+
+
+# --------------------------------------------------------------
+# SQLite-backed queue
+# --------------------------------------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    body TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending, done or failed
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_pending ON messages (status, lease_until);
+CREATE TABLE IF NOT EXISTS tickets (
+    idempotency_key TEXT PRIMARY KEY,
+    reply TEXT NOT NULL,
+    category TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    sentiment TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    completed_at REAL NOT NULL
+);
+"""
+
+
+def idempotency_key(source: str, message_id: str) -> str:
+    # Two customers can send the same text, so the key identifies the delivery, not the content
+    return hashlib.sha256(f"{source}:{message_id}".encode()).hexdigest()
+
+
+class TicketQueue:
+    def __init__(self, path: str = "tickets.db", lease_seconds: float = 60.0):
+        self.lease_seconds = lease_seconds
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def enqueue(self, customer_message: str, source: str, message_id: str) -> bool:
+        """Add a message to the queue. Returns False if it was already enqueued."""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO messages (idempotency_key, body, enqueued_at) VALUES (?, ?, ?)",
+            (idempotency_key(source, message_id), customer_message, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, limit: int) -> list[tuple[int, str, str, float]]:
+        """Lease up to `limit` pending messages so no other consumer picks them up."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(
+                """
+                UPDATE messages SET lease_until = ?, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM messages
+                    WHERE status = 'pending' AND lease_until < ?
+                    ORDER BY id LIMIT ?
+                )
+                RETURNING id, idempotency_key, body, enqueued_at
+                """,
+                (now + self.lease_seconds, now, limit),
+            ).fetchall()
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return sorted(rows)
+
+    def renew(self, message_ids: list[int]):
+        """Extend the lease of messages that are still being worked on."""
+        self.conn.executemany(
+            "UPDATE messages SET lease_until = ? WHERE id = ? AND status = 'pending'",
+            [(time.time() + self.lease_seconds, i) for i in message_ids],
+        )
+
+    def is_processed(self, key: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM tickets WHERE idempotency_key = ?", (key,)
+        ).fetchone()
+        return row is not None
+
+    def complete(self, results: list[tuple[int, str, float, Ticket]]) -> int:
+        """Store tickets and acknowledge their messages in a single transaction.
+
+        Returns the number of new tickets, messages stored before are not counted again.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = self.conn.executemany(
+                "INSERT OR IGNORE INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        key,
+                        ticket.reply,
+                        ticket.category.value,
+                        ticket.confidence,
+                        ticket.sentiment.value,
+                        enqueued_at,
+                        now,
+                    )
+                    for _, key, enqueued_at, ticket in results
+                ],
+            )
+            self.conn.executemany(
+                "UPDATE messages SET status = 'done' WHERE id = ?",
+                [(message_id,) for message_id, *_ in results],
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return stored.rowcount
+
+    def acknowledge(self, message_ids: list[int]):
+        self.conn.executemany(
+            "UPDATE messages SET status = 'done' WHERE id = ?",
+            [(i,) for i in message_ids],
+        )
+
+    def release(self, failures: list[tuple[int, str]], max_attempts: int) -> int:
+        """Make failed messages available again, dead-lettering those out of attempts.
+
+        Returns the number of messages that were marked failed.
+        """
+        dead = 0
+        for message_id, error in failures:
+            cursor = self.conn.execute(
+                "UPDATE messages SET status = 'failed', last_error = ? WHERE id = ? AND attempts >= ?",
+                (error, message_id, max_attempts),
+            )
+            if cursor.rowcount:
+                dead += 1
+            else:
+                self.conn.execute(
+                    "UPDATE messages SET lease_until = 0, last_error = ? WHERE id = ?",
+                    (error, message_id),
+                )
+        return dead
+
+    def dead_letters(self) -> list[tuple[int, str, int, str]]:
+        return self.conn.execute(
+            "SELECT id, body, attempts, last_error FROM messages WHERE status = 'failed'"
+        ).fetchall()
+
+    def replay(self, message_ids: list[int] | None = None) -> int:
+        """Move failed messages back to pending, e.g. after fixing the cause."""
+        if message_ids is None:
+            cursor = self.conn.execute(
+                "UPDATE messages SET status = 'pending', attempts = 0, lease_until = 0 WHERE status = 'failed'"
+            )
+            return cursor.rowcount
+        return sum(
+            self.conn.execute(
+                "UPDATE messages SET status = 'pending', attempts = 0, lease_until = 0 WHERE id = ? AND status = 'failed'",
+                (message_id,),
+            ).rowcount
+            for message_id in message_ids
+        )
+
+    def depth(self) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE status = 'pending'"
+        ).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# --------------------------------------------------------------
+# Consumer pool
+# --------------------------------------------------------------
+
+
+def consume(
+    queue: TicketQueue,
+    handler=process_ticket,
+    workers: int = 8,
+    batch_size: int = 32,
+    max_attempts: int = 5,
+    poll_interval: float = 0.5,
+    flush_interval: float = 1.0,
+    stop_when_empty: bool = True,
+) -> dict:
+    if flush_interval >= queue.lease_seconds:
+        raise ValueError(
+            "flush_interval must be shorter than the queue's lease_seconds"
+        )
+    processed, failed, lags = 0, 0, []
+    results, retry = [], []
+    in_flight = {}
+    last_flush = last_renewal = time.monotonic()
+    # Renew leases well before they expire, so no other claim picks up our messages
+    renew_interval = queue.lease_seconds / 3
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal processed, failed, last_flush
+        processed += queue.complete(results)
+        now = time.time()
+        lags.extend(now - enqueued_at for _, _, enqueued_at, _ in results)
+        # Failed messages are retried, poison messages are dead-lettered after max_attempts
+        failed += queue.release(retry, max_attempts)
+        results.clear()
+        retry.clear()
+        last_flush = time.monotonic()
+
+    def held_ids() -> set[int]:
+        return (
+            {message[0] for message in in_flight.values()}
+            | {message_id for message_id, *_ in results}
+            | {message_id for message_id, _ in retry}
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Only claim what the free workers can start on, so leases don't expire in line
+            batch = (
+                queue.claim(workers - len(in_flight))
+                if len(in_flight) < workers
+                else []
+            )
+
+            # A retried message may have been stored by an earlier attempt
+            duplicates = [m for m in batch if queue.is_processed(m[1])]
+            queue.acknowledge([message_id for message_id, *_ in duplicates])
+            held = held_ids()
+            for message in batch:
+                # Never run a message twice while we are still working on it
+                if message not in duplicates and message[0] not in held:
+                    in_flight[pool.submit(handler, message[2])] = message
+
+            if not in_flight:
+                if results or retry:
+                    # Released retries are pending again, claim them before stopping
+                    flush()
+                    continue
+                if batch:
+                    continue
+                if stop_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(
+                in_flight,
+                timeout=min(poll_interval, renew_interval),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                message_id, key, _, enqueued_at = in_flight.pop(future)
+                try:
+                    results.append((message_id, key, enqueued_at, future.result()))
+                except Exception as e:
+                    print(f"Message {message_id} failed: {e}")
+                    retry.append((message_id, repr(e)))
+
+            # Commit completed messages in batches instead of one transaction each
+            if (
+                len(results) + len(retry) >= batch_size
+                or time.monotonic() - last_flush >= flush_interval
+            ):
+                flush()
+            if time.monotonic() - last_renewal >= renew_interval:
+                queue.renew(list(held_ids()))
+                last_renewal = time.monotonic()
+
+    elapsed = time.perf_counter() - start
+    lags.sort()
+    return {
+        "processed": processed,
+        "failed": failed,
+        "throughput": processed / elapsed if elapsed else 0.0,
+        "queue_depth": queue.depth(),
+        "lag_p50": lags[len(lags) // 2] if lags else 0.0,
+        "lag_max": lags[-1] if lags else 0.0,
+    }
+
+
+# --------------------------------------------------------------
+# Ingest and process messages
+# --------------------------------------------------------------
+
+queue = TicketQueue("tickets.db")
+
+# (source, message id, text), e.g. from an email inbox or a chat webhook
+messages = [
+    (
+        "email",
+        "msg-1001",
+        "Hi there, I have a question about my bill. Can you help me?",
+    ),
+    ("email", "msg-1002", "I would like to place an order."),
+    ("chat", "conv-77/3", "My package arrived damaged, this is the second time!"),
+    ("chat", "conv-81/1", "Thanks for the quick refund, great service."),
+    # Same text from another customer, this is a separate ticket
+    ("email", "msg-1003", "I would like to place an order."),
+]
+
+for source, message_id, text in messages:
+    queue.enqueue(text, source=source, message_id=message_id)
+
+# The webhook delivering the same message again is a no-op thanks to the idempotency key
+queue.enqueue(messages[0][2], source="email", message_id="msg-1001")
+
+stats = consume(queue, workers=4, batch_size=16)
+print(stats)
+
+# Messages that ran out of attempts keep their last error and can be replayed
+for message_id, body, attempts, error in queue.dead_letters():
+    print(f"Message {message_id} failed after {attempts} attempts: {error}")
+queue.replay()
+
+queue.conn.execute("SELECT category, sentiment, reply FROM tickets").fetchall()
+queue.close()
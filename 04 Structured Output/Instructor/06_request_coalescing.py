@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+
+import instructor
+from openai import AsyncOpenAI, OpenAI
+from pydantic import BaseModel, Field
+
+
+# --------------------------------------------------------------
+# Request Coalescing Example
+# --------------------------------------------------------------
+
+"""
+When the same customer message arrives several times in a burst, every caller would send
+its own identical request. With a single-flight layer, concurrent identical requests
+(same model, messages, schema and parameters) share one in-flight call and all receive
+the same parsed result. Requests are only shared while they are in flight, nothing is cached.
+"""
+
+MODEL = "gpt-4o-2024-08-06"
+
+
+def request_key(**kwargs) -> str:
+    """Build a stable key from the request parameters, including the output schema."""
+    for name in ("response_model", "response_format"):
+        schema = kwargs.get(name)
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            # Classes with the same fields can differ in their validators, so the class
+            # itself is part of the key (id() tells apart classes made in a function)
+            kwargs[name] = {
+                "class": f"{schema.__module__}.{schema.__qualname__}:{id(schema)}",
+                "schema": schema.model_json_schema(),
+            }
+    payload = json.dumps(kwargs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self._async_calls: dict[str, asyncio.Task] = {}
+
+    def do(self, key: str, fn, *args, **kwargs):
+        """Call fn, unless an identical call is already in flight, then wait for that one."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self._calls[key] = leader = Future()
+
+        if future is not None:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            leader.set_exception(e)
+            raise
+        else:
+            leader.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key: str, fn, *args, **kwargs):
+        """Async counterpart of do(), for coroutines running on the same event loop."""
+        task = self._async_calls.get(key)
+        if task is not None:
+            with self._lock:
+                self.coalesced += 1
+        else:
+            # The shared call runs in its own task, so it doesn't belong to any one caller
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._async_calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so cancelling one caller, leader or follower, doesn't cancel the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+def coalesced(create, flight: SingleFlight):
+    """Wrap a create/parse method so that identical concurrent requests share a call."""
+    if asyncio.iscoroutinefunction(create):
+
+        async def async_wrapper(**kwargs):
+            return await flight.do_async(request_key(**kwargs), create, **kwargs)
+
+        return async_wrapper
+
+    def wrapper(**kwargs):
+        return flight.do(request_key(**kwargs), create, **kwargs)
+
+    return wrapper
+
+
+flight = SingleFlight()
+
+
+# --------------------------------------------------------------
+# Ticket System with the sync client
+# --------------------------------------------------------------
+
+client = instructor.from_openai(OpenAI())
+create_ticket = coalesced(client.chat.completions.create, flight)
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(BaseModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+def process_ticket(customer_message: str) -> Ticket:
+    reply = create_ticket(
+        model="gpt-3.5-turbo",
+        response_model=Ticket,
+        max_retries=3,
+        messages=[
+            {
+                "role": "system",
+                "content": "Analyze the incoming customer message and predict the values for the ticket.",
+            },
+            {"role": "user", "content": customer_message},
+        ],
+    )
+
+    return reply
+
+
+# A burst of the same message results in a single API call
+burst = ["Hi there, I have a question about my bill. Can you help me?"] * 5
+
+with ThreadPoolExecutor(max_workers=5) as pool:
+    tickets = list(pool.map(process_ticket, burst))
+
+print(f"Coalesced calls: {flight.coalesced}")
+assert all(ticket is tickets[0] for ticket in tickets)
+
+# --------------------------------------------------------------
+# Ticket System with the async client
+# --------------------------------------------------------------
+
+async_client = instructor.from_openai(AsyncOpenAI())
+create_ticket_async = coalesced(async_client.chat.completions.create, flight)
+
+
+async def process_ticket_async(customer_message: str) -> Ticket:
+    reply = await create_ticket_async(
+        model="gpt-3.5-turbo",
+        response_model=Ticket,
+        max_retries=3,
+        messages=[
+            {
+                "role": "system",
+                "content": "Analyze the incoming customer message and predict the values for the ticket.",
+            },
+            {"role": "user", "content": customer_message},
+        ],
+    )
+
+    return reply
+
+
+async def main():
+    return await asyncio.gather(*(process_ticket_async(m) for m in burst))
+
+
+tickets = asyncio.run(main())
+print(f"Coalesced calls: {flight.coalesced}")
+
+# --------------------------------------------------------------
+# Text summarization with client.beta.chat.completions.parse
+# --------------------------------------------------------------
+
+openai_client = OpenAI()
+parse_summary = coalesced(openai_client.beta.chat.completions.parse, flight)
+
+summarization_prompt = """
+You will be provided with content from an article about an invention.
+Your goal will be to summarize the article following the schema provided.
+"""
+
+
+class ArticleSummary(BaseModel):
+    invented_year: int
+    summary: str
+    inventors: list[str]
+    description: str
+
+    class Concept(BaseModel):
+        title: str
+        description: str
+
+    concepts: list[Concept]
+
+
+def get_article_summary(text: str):
+    completion = parse_summary(
+        model=MODEL,
+        temperature=0.2,
+        messages=[
+            {"role": "system", "content": summarization_prompt},
+            {"role": "user", "content": text},
+        ],
+        response_format=ArticleSummary,
+    )
+
+    return completion.choices[0].message.parsed
+
+
+# The same article showing up several times is only summarized once
+article = "The transformer is a deep learning architecture introduced in 2017 by Vaswani et al."
+
+with ThreadPoolExecutor(max_workers=3) as pool:
+    summaries = list(pool.map(get_article_summary, [article] * 3))
+
+print(f"Coalesced calls: {flight.coalesced}")
@@ -0,0 +1,199 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from enum import Enum
+
+import instructor
+from openai import AsyncOpenAI
+from pydantic import BaseModel, Field
+
+from mock_server import MockChatServer, mock_ticket, pareto_latency
+
+
+# --------------------------------------------------------------
+# Hedged Requests Example
+# --------------------------------------------------------------
+
+"""
+A few upstream calls that stall dominate the p99 latency. With hedging, if a call hasn't
+returned within a deadline derived from recent latencies (e.g. the p90), a duplicate
+request is fired. The first valid parse wins and the other request is cancelled.
+A budget caps the share of calls that may be hedged, so a slow API doesn't double the load.
+
+Structured outputs are parsed from the complete response, so the deadline applies to the
+whole call rather than to the first streamed token.
+"""
+
+client = instructor.from_openai(AsyncOpenAI())
+
+
+class Hedger:
+    def __init__(
+        self,
+        percentile: float = 0.9,
+        max_hedge_rate: float = 0.1,
+        initial_deadline: float = 1.0,
+        min_samples: int = 20,
+        window: int = 500,
+    ):
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.initial_deadline = initial_deadline
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def deadline(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.initial_deadline
+        ordered = sorted(self.latencies)
+        return ordered[int(self.percentile * (len(ordered) - 1))]
+
+    def can_hedge(self) -> bool:
+        return self.hedged < self.max_hedge_rate * self.calls
+
+    async def call(self, fn, *args, **kwargs):
+        self.calls += 1
+        start = time.perf_counter()
+        primary = asyncio.create_task(fn(*args, **kwargs))
+        # Only the primary's own latency goes into the window, the time of a call won by
+        # the hedge is shorter and would keep lowering the deadline
+        primary.add_done_callback(lambda task: self._record(task, start))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.deadline())
+
+            if not done and self.can_hedge():
+                self.hedged += 1
+                hedge = asyncio.create_task(fn(*args, **kwargs))
+                pending = {primary, hedge}
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    winner = next((t for t in done if t.exception() is None), None)
+                    if winner is not None:
+                        self.hedge_wins += winner is hedge
+                        return winner.result()
+                # Both requests failed, surface the error of the original call
+                return primary.result()
+
+            return await primary
+        finally:
+            # Cancel the loser, or both requests if the caller was cancelled
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _record(self, task: asyncio.Task, start: float):
+        if not task.cancelled() and task.exception() is None:
+            self.latencies.append(time.perf_counter() - start)
+
+
+hedger = Hedger()
+
+
+# --------------------------------------------------------------
+# Ticket System with hedging
+# --------------------------------------------------------------
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(BaseModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+async def process_ticket(customer_message: str, client=client) -> Ticket:
+    reply = await client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        response_model=Ticket,
+        max_retries=3,
+        messages=[
+            {
+                "role": "system",
+                "content": "Analyze the incoming customer message and predict the values for the ticket.",
+            },
+            {"role": "user", "content": customer_message},
+        ],
+    )
+
+    return reply
+
+
+async def process_ticket_hedged(customer_message: str, client=client) -> Ticket:
+    return await hedger.call(process_ticket, customer_message, client=client)
+
+
+ticket = asyncio.run(
+    process_ticket_hedged("Hi there, I have a question about my bill. Can you help me?")
+)
+ticket.category
+
+# --------------------------------------------------------------
+# Benchmark against a mock with heavy-tailed latency
+# --------------------------------------------------------------
+
+
+def percentile(values: list[float], p: float) -> float:
+    return statistics.quantiles(values, n=100)[int(p) - 1]
+
+
+async def benchmark(handler, client, requests: int = 500, concurrency: int = 20):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await handler("Hi there, I have a question about my bill.", client=client)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+async def compare(url: str):
+    # The client must be created inside the event loop it is used in
+    mock_client = instructor.from_openai(
+        AsyncOpenAI(base_url=url, api_key="mock", max_retries=0)
+    )
+    baseline = await benchmark(process_ticket, mock_client)
+    hedged = await benchmark(process_ticket_hedged, mock_client)
+    return baseline, hedged
+
+
+hedger = Hedger(percentile=0.9, max_hedge_rate=0.1)
+
+with MockChatServer(mock_ticket, latency=pareto_latency()) as server:
+    baseline, hedged = asyncio.run(compare(server.url))
+
+for name, latencies in [("baseline", baseline), ("hedged", hedged)]:
+    print(
+        f"{name:>8}: p50={percentile(latencies, 50):.3f}s "
+        f"p99={percentile(latencies, 99):.3f}s max={max(latencies):.3f}s"
+    )
+print(
+    f"Hedged {hedger.hedged}/{hedger.calls} calls "
+    f"({hedger.hedged / hedger.calls:.1%}), hedge won {hedger.hedge_wins} times"
+)
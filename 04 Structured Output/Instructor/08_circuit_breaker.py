@@ -0,0 +1,278 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from json import JSONDecodeError
+
+import instructor
+from openai import OpenAI
+from pydantic import BaseModel, Field, ValidationError
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt
+
+from mock_server import MockChatServer, mock_ticket
+
+
+# --------------------------------------------------------------
+# Circuit Breaker Example
+# --------------------------------------------------------------
+
+"""
+When the API degrades, every ticket piles up retries (max_retries=3 in Instructor on top of
+the retries of the OpenAI client) and worker threads block for minutes. A circuit breaker
+tracks the failure rate and slow calls of the chat completions client:
+
+- closed: requests go through, outcomes are recorded in a rolling window
+- open: too many failures or slow calls, requests fail fast and we use a fallback
+- half-open: after a cooldown a few probe requests decide whether to close again
+"""
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 3,
+    ):
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        # Bumped on every state change, so late results of earlier calls can be ignored
+        self._generation = 0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> int | None:
+        """Returns a token to pass to record(), or None if the call is rejected."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return None
+                self._set_state(self.HALF_OPEN)
+                self._probes = self._probe_successes = 0
+
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return None
+                self._probes += 1
+            return self._generation
+
+    def record(self, token: int, success: bool, elapsed: float):
+        # A call that succeeds but takes too long counts as a failure
+        ok = success and elapsed < self.slow_call_seconds
+        with self._lock:
+            if token != self._generation:
+                # Admitted before the last state change, e.g. still in flight when the
+                # circuit opened: it must neither extend the cooldown nor count as a probe
+                return
+            if self.state == self.HALF_OPEN:
+                if not ok:
+                    self._open()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._set_state(self.CLOSED)
+                        self._outcomes.clear()
+                return
+
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def _set_state(self, state: str):
+        self.state = state
+        self._generation += 1
+
+    def _open(self):
+        self._set_state(self.OPEN)
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def wrap(self, fn):
+        def guarded(*args, **kwargs):
+            token = self.allow()
+            if token is None:
+                raise CircuitOpenError(f"Circuit is {self.state}, not calling the API")
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                self.record(token, False, time.monotonic() - start)
+                raise
+            self.record(token, True, time.monotonic() - start)
+            return result
+
+        return guarded
+
+
+# --------------------------------------------------------------
+# Guarded client
+# --------------------------------------------------------------
+
+
+def guarded_client(breaker: CircuitBreaker, **kwargs):
+    # Fail fast at the HTTP level, the breaker decides when to stop calling the API
+    openai_client = OpenAI(timeout=10.0, max_retries=0, **kwargs)
+    # Every request, including re-asks and llm_validator calls, goes through the breaker
+    openai_client.chat.completions.create = breaker.wrap(
+        openai_client.chat.completions.create
+    )
+    return instructor.from_openai(openai_client)
+
+
+breaker = CircuitBreaker()
+client = guarded_client(breaker)
+
+
+# Only re-ask the model on invalid output, API errors are handled by the breaker
+def validation_retries() -> Retrying:
+    return Retrying(
+        stop=stop_after_attempt(3),
+        retry=retry_if_exception_type((ValidationError, JSONDecodeError)),
+    )
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(BaseModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+# --------------------------------------------------------------
+# Fallback: local keyword classifier with canned replies
+# --------------------------------------------------------------
+
+CATEGORY_KEYWORDS = {
+    TicketCategory.BILLING: ("bill", "invoice", "charge", "payment", "refund"),
+    TicketCategory.ORDER: ("order", "package", "delivery", "shipping", "return"),
+}
+
+CANNED_REPLIES = {
+    TicketCategory.GENERAL: "Thanks for reaching out! A member of our team will get back to you shortly.",
+    TicketCategory.ORDER: "Thanks for your message about your order. We'll look into it and get back to you shortly.",
+    TicketCategory.BILLING: "Thanks for your message about billing. Our billing team will get back to you shortly.",
+}
+
+
+def fallback_ticket(customer_message: str) -> Ticket:
+    text = customer_message.lower()
+    category = next(
+        (c for c, words in CATEGORY_KEYWORDS.items() if any(w in text for w in words)),
+        TicketCategory.GENERAL,
+    )
+    return Ticket(
+        reply=CANNED_REPLIES[category],
+        category=category,
+        # Low confidence flags the ticket for review once the API is back
+        confidence=0.0,
+        sentiment=CustomerSentiment.NEUTRAL,
+    )
+
+
+def process_ticket(customer_message: str, client=client) -> Ticket:
+    try:
+        reply = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            response_model=Ticket,
+            max_retries=validation_retries(),
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Analyze the incoming customer message and predict the values for the ticket.",
+                },
+                {"role": "user", "content": customer_message},
+            ],
+        )
+    except Exception:
+        # Open circuit, timeouts and API errors all end up with the fallback
+        return fallback_ticket(customer_message)
+
+    return reply
+
+
+ticket = process_ticket("Hi there, I have a question about my bill. Can you help me?")
+ticket.category
+
+# --------------------------------------------------------------
+# Fault injection against a local stand-in server
+# --------------------------------------------------------------
+
+
+def run_phase(name: str, handler, requests: int = 200, workers: int = 20) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        tickets = list(
+            pool.map(handler, ["I was charged twice on my bill."] * requests)
+        )
+    elapsed = time.perf_counter() - start
+    fallbacks = sum(ticket.confidence == 0.0 for ticket in tickets)
+    throughput = requests / elapsed
+    print(
+        f"{name:>10}: {throughput:7.1f} tickets/s, {fallbacks} fallbacks, breaker {breaker.state}"
+    )
+    return throughput
+
+
+with MockChatServer(mock_ticket, latency=lambda: 0.02) as server:
+    breaker = CircuitBreaker(slow_call_seconds=1.0, open_seconds=2.0)
+    mock_client = guarded_client(breaker, base_url=server.url, api_key="mock")
+
+    def handler(message):
+        return process_ticket(message, client=mock_client)
+
+    healthy = run_phase("healthy", handler)
+
+    # Outage: every request stalls and then fails
+    server.latency, server.failure_rate = (lambda: 1.5), 1.0
+    outage = run_phase("outage", handler)
+
+    # Recovery: the breaker lets probes through after open_seconds and closes again
+    server.latency, server.failure_rate = (lambda: 0.02), 0.0
+    time.sleep(breaker.open_seconds)
+    recovered = run_phase("recovered", handler)
+
+assert breaker.state == CircuitBreaker.CLOSED
+# Without the breaker, 200 tickets at 1.5s per call with 20 workers would take 15s
+assert outage > 20 * 2
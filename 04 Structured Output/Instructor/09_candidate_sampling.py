@@ -0,0 +1,170 @@
+import random
+import statistics
+import time
+from enum import Enum
+
+import instructor
+from openai import OpenAI
+from pydantic import BaseModel, Field, ValidationError
+
+from mock_server import MockChatServer
+
+
+# --------------------------------------------------------------
+# Parallel Candidate Sampling Example
+# --------------------------------------------------------------
+
+"""
+With max_retries=3, Instructor re-asks the model after every failed validation, which means
+up to four sequential round-trips. Instead, we can request n candidates in a single completion
+call, validate all of them against the Pydantic model and pick the first or best valid one.
+Only when all candidates fail do we fall back to Instructor's sequential retry loop.
+
+Note that every candidate is billed as completion tokens.
+"""
+
+openai_client = OpenAI()
+client = instructor.from_openai(openai_client)
+
+query = "Hi there, I have a question about my bill. Can you help me? "
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class Reply(BaseModel):
+    content: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(
+        ge=0, le=1, description="Confidence in the category prediction."
+    )
+
+
+def validate_candidates(completion, response_model: type[BaseModel]):
+    """Validate every choice, returning the valid models and the validation errors."""
+    valid, errors = [], []
+    for choice in completion.choices:
+        tool_calls = choice.message.tool_calls or []
+        try:
+            if not tool_calls:
+                raise ValueError("No tool call in the response")
+            valid.append(
+                response_model.model_validate_json(tool_calls[0].function.arguments)
+            )
+        except (ValidationError, ValueError) as e:
+            errors.append(e)
+    return valid, errors
+
+
+def create_with_candidates(
+    response_model: type[BaseModel],
+    messages: list[dict],
+    n: int = 4,
+    select: str = "first",
+    model: str = "gpt-3.5-turbo",
+    max_retries: int = 3,
+    openai_client=openai_client,
+    client=client,
+):
+    completion = openai_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        n=n,
+        tools=[
+            {
+                "type": "function",
+                "function": {
+                    "name": response_model.__name__,
+                    "description": response_model.__doc__ or "",
+                    "parameters": response_model.model_json_schema(),
+                },
+            }
+        ],
+        tool_choice={"type": "function", "function": {"name": response_model.__name__}},
+    )
+
+    valid, errors = validate_candidates(completion, response_model)
+    if valid:
+        if select == "best" and "confidence" in response_model.model_fields:
+            return max(valid, key=lambda candidate: candidate.confidence)
+        return valid[0]
+
+    # All candidates failed, fall back to the sequential re-ask loop
+    return client.chat.completions.create(
+        model=model,
+        response_model=response_model,
+        max_retries=max_retries,
+        messages=messages,
+    )
+
+
+messages = [
+    {
+        "role": "system",
+        "content": "You're a helpful customer care assistant that can classify incoming messages and create a response. Set confidence between 1-100.",
+    },
+    {"role": "user", "content": query},
+]
+
+reply = create_with_candidates(Reply, messages, n=4, select="best")
+reply.model_dump()
+
+# --------------------------------------------------------------
+# Benchmark against a mock with a configurable invalid-output rate
+# --------------------------------------------------------------
+
+
+def mock_reply(invalid_rate: float):
+    def payload(request: dict) -> dict:
+        if random.random() < invalid_rate:
+            return {"content": "Happy to help!", "category": "banana", "confidence": 85}
+        return {"content": "Happy to help!", "category": "billing", "confidence": 0.85}
+
+    return payload
+
+
+def benchmark(handler, calls: int = 50):
+    latencies, failures = [], 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            handler()
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    return statistics.mean(latencies), max(latencies), failures
+
+
+for invalid_rate in [0.1, 0.3, 0.6]:
+    with MockChatServer(mock_reply(invalid_rate), latency=lambda: 0.1) as server:
+        mock_openai = OpenAI(base_url=server.url, api_key="mock", max_retries=0)
+        mock_client = instructor.from_openai(mock_openai)
+
+        reask = benchmark(
+            lambda: mock_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                response_model=Reply,
+                max_retries=3,
+                messages=[dict(m) for m in messages],
+            )
+        )
+        sampling = benchmark(
+            lambda: create_with_candidates(
+                Reply,
+                [dict(m) for m in messages],
+                n=4,
+                openai_client=mock_openai,
+                client=mock_client,
+            )
+        )
+
+    for name, (mean, worst, failures) in [("re-ask", reask), ("n=4", sampling)]:
+        print(
+            f"invalid={invalid_rate:.0%} {name:>6}: mean={mean:.3f}s "
+            f"max={worst:.3f}s failures={failures}"
+        )
@@ -0,0 +1,217 @@
+import random
+import tracemalloc
+from enum import Enum
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+
+# --------------------------------------------------------------
+# Compact Ticket Batch Example
+# --------------------------------------------------------------
+
+"""
+Holding hundreds of thousands of Pydantic Ticket objects in memory for reporting costs far
+more RAM than the data itself: every object carries its own dict, enum references and boxed
+floats. A TicketBatch stores the same data column by column:
+
+- category and sentiment as int8 codes
+- confidence as a float32 array
+- all replies in a single UTF-8 string arena, addressed by start/end offsets
+
+Filters and aggregations run vectorized on the arrays, and Ticket objects are only created
+when you access a row.
+"""
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(BaseModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+CATEGORIES = list(TicketCategory)
+SENTIMENTS = list(CustomerSentiment)
+
+
+class TicketBatch:
+    def __init__(
+        self,
+        category: np.ndarray,
+        sentiment: np.ndarray,
+        confidence: np.ndarray,
+        reply_starts: np.ndarray,
+        reply_ends: np.ndarray,
+        arena: bytes,
+    ):
+        self.category = category
+        self.sentiment = sentiment
+        self.confidence = confidence
+        self.reply_starts = reply_starts
+        self.reply_ends = reply_ends
+        self.arena = arena
+
+    @classmethod
+    def from_tickets(cls, tickets) -> "TicketBatch":
+        category_codes = {c: i for i, c in enumerate(CATEGORIES)}
+        sentiment_codes = {s: i for i, s in enumerate(SENTIMENTS)}
+        category, sentiment, confidence, replies = [], [], [], []
+        for ticket in tickets:
+            category.append(category_codes[ticket.category])
+            sentiment.append(sentiment_codes[ticket.sentiment])
+            confidence.append(ticket.confidence)
+            replies.append(ticket.reply.encode())
+
+        lengths = np.fromiter(map(len, replies), dtype=np.int64, count=len(replies))
+        ends = np.cumsum(lengths)
+        return cls(
+            category=np.array(category, dtype=np.int8),
+            sentiment=np.array(sentiment, dtype=np.int8),
+            confidence=np.array(confidence, dtype=np.float32),
+            reply_starts=ends - lengths,
+            reply_ends=ends,
+            arena=b"".join(replies),
+        )
+
+    def __len__(self) -> int:
+        return len(self.category)
+
+    def reply(self, i: int) -> str:
+        return self.arena[self.reply_starts[i] : self.reply_ends[i]].decode()
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            # Skip validation, the values were validated when the batch was built
+            return Ticket.model_construct(
+                reply=self.reply(key),
+                category=CATEGORIES[self.category[key]],
+                confidence=float(self.confidence[key]),
+                sentiment=SENTIMENTS[self.sentiment[key]],
+            )
+        # Slices, index arrays and boolean masks share the string arena
+        return TicketBatch(
+            self.category[key],
+            self.sentiment[key],
+            self.confidence[key],
+            self.reply_starts[key],
+            self.reply_ends[key],
+            self.arena,
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def filter(
+        self,
+        category: TicketCategory | None = None,
+        sentiment: CustomerSentiment | None = None,
+        min_confidence: float | None = None,
+        max_confidence: float | None = None,
+    ) -> "TicketBatch":
+        mask = np.ones(len(self), dtype=bool)
+        if category is not None:
+            mask &= self.category == CATEGORIES.index(category)
+        if sentiment is not None:
+            mask &= self.sentiment == SENTIMENTS.index(sentiment)
+        if min_confidence is not None:
+            mask &= self.confidence >= min_confidence
+        if max_confidence is not None:
+            mask &= self.confidence <= max_confidence
+        return self[mask]
+
+    def category_counts(self) -> dict[TicketCategory, int]:
+        counts = np.bincount(self.category, minlength=len(CATEGORIES))
+        return dict(zip(CATEGORIES, counts.tolist()))
+
+    def sentiment_counts(self) -> dict[CustomerSentiment, int]:
+        counts = np.bincount(self.sentiment, minlength=len(SENTIMENTS))
+        return dict(zip(SENTIMENTS, counts.tolist()))
+
+    def mean_confidence_per_category(self) -> dict[TicketCategory, float]:
+        totals = np.bincount(
+            self.category, weights=self.confidence, minlength=len(CATEGORIES)
+        )
+        counts = np.bincount(self.category, minlength=len(CATEGORIES))
+        means = np.divide(
+            totals, counts, out=np.full(len(CATEGORIES), np.nan), where=counts > 0
+        )
+        return dict(zip(CATEGORIES, means.tolist()))
+
+    def confidence_histogram(self, bins: int = 10):
+        return np.histogram(self.confidence, bins=bins, range=(0.0, 1.0))
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [
+            self.category,
+            self.sentiment,
+            self.confidence,
+            self.reply_starts,
+            self.reply_ends,
+        ]
+        return sum(a.nbytes for a in arrays) + len(self.arena)
+
+
+# --------------------------------------------------------------
+# Reporting on a large batch of tickets
+# --------------------------------------------------------------
+
+replies = [
+    "Thanks for reaching out! Could you share your invoice number so I can look into your bill?",
+    "I'm sorry to hear your order arrived damaged. We'll send a replacement right away.",
+    "Happy to help! Your order has shipped and should arrive within 3-5 business days.",
+]
+
+
+def random_ticket() -> Ticket:
+    return Ticket(
+        # A unique suffix, like real replies, so strings aren't shared between objects
+        reply=f"{random.choice(replies)} (ref {random.randrange(10**8)})",
+        category=random.choice(CATEGORIES),
+        confidence=random.random(),
+        sentiment=random.choice(SENTIMENTS),
+    )
+
+
+tracemalloc.start()
+tickets = [random_ticket() for _ in range(200_000)]
+objects_size = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+
+batch = TicketBatch.from_tickets(tickets)
+print(f"Pydantic objects: {objects_size / 1024**2:.1f} MB")
+print(f"TicketBatch:      {batch.nbytes / 1024**2:.1f} MB")
+
+batch.category_counts()
+batch.sentiment_counts()
+batch.mean_confidence_per_category()
+counts, edges = batch.confidence_histogram(bins=10)
+
+# Vectorized filters return a new batch that shares the reply arena
+unhappy_billing = batch.filter(
+    category=TicketCategory.BILLING,
+    sentiment=CustomerSentiment.NEGATIVE,
+    max_confidence=0.5,
+)
+len(unhappy_billing)
+
+# Ticket objects are only created for the rows you access
+ticket = unhappy_billing[0]
+assert isinstance(ticket, Ticket) and ticket.category == TicketCategory.BILLING
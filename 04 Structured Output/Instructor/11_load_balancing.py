@@ -0,0 +1,331 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from json import JSONDecodeError
+
+import instructor
+from openai import AzureOpenAI, OpenAI
+from pydantic import BaseModel, Field, ValidationError
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt
+
+from mock_server import MockChatServer, mock_ticket
+
+
+# --------------------------------------------------------------
+# Latency-Aware Load Balancing Example
+# --------------------------------------------------------------
+
+"""
+A single key or region caps throughput and adds latency spikes. The router below spreads calls
+over several endpoints (e.g. OpenAI plus Azure deployments, or several keys):
+
+- per endpoint it keeps an exponentially weighted moving average (EWMA) of latency and errors
+- each call goes to the endpoint with the lowest expected wait: EWMA latency times the number
+  of outstanding requests, plus the error rate times the cost of a failed call
+- the error rate decays over time, so a penalized endpoint gets traffic again and can recover
+- a token bucket per endpoint respects its requests-per-minute limit
+- failed calls are retried once on another endpoint
+"""
+
+
+class Endpoint:
+    def __init__(
+        self,
+        name: str,
+        client: OpenAI,
+        model: str | None = None,
+        requests_per_minute: float | None = None,
+    ):
+        self.name = name
+        self.client = client
+        self.instructor = instructor.from_openai(client)
+        # Azure uses deployment names instead of model names
+        self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.tokens = requests_per_minute or 0.0
+        self.refilled_at = time.monotonic()
+        self.latency = None
+        self.error_rate = 0.0
+        self.error_updated_at = time.monotonic()
+        self.outstanding = 0
+        self.calls = 0
+
+    def has_capacity(self, now: float) -> bool:
+        if self.requests_per_minute is None:
+            return True
+        self.tokens = min(
+            self.requests_per_minute,
+            self.tokens + (now - self.refilled_at) * self.requests_per_minute / 60,
+        )
+        self.refilled_at = now
+        return self.tokens >= 1
+
+
+class Router:
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        alpha: float = 0.2,
+        initial_latency: float = 1.0,
+        failure_cost: float = 5.0,
+        error_half_life: float = 5.0,
+    ):
+        self.endpoints = endpoints
+        self.alpha = alpha
+        # Latency assumed for an endpoint before its first call, if no endpoint has been measured
+        self.initial_latency = initial_latency
+        # Seconds a failed call costs us: the wasted attempt plus the failover
+        self.failure_cost = failure_cost
+        # Seconds after which the error rate of an endpoint that gets no calls has halved
+        self.error_half_life = error_half_life
+        self._lock = threading.Lock()
+
+    def error_rate(self, endpoint: Endpoint, now: float) -> float:
+        # Without decay, an endpoint that failed a few times would never be picked again
+        # to show that it recovered
+        elapsed = now - endpoint.error_updated_at
+        return endpoint.error_rate * 0.5 ** (elapsed / self.error_half_life)
+
+    def score(self, endpoint: Endpoint) -> float:
+        latency = endpoint.latency
+        if latency is None:
+            # New endpoints start at the mean of the measured ones
+            measured = [e.latency for e in self.endpoints if e.latency is not None]
+            latency = (
+                sum(measured) / len(measured) if measured else self.initial_latency
+            )
+        return (
+            latency * (endpoint.outstanding + 1)
+            + self.error_rate(endpoint, time.monotonic()) * self.failure_cost
+        )
+
+    def acquire(self, exclude: Endpoint | None = None) -> Endpoint:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                candidates = [
+                    e
+                    for e in self.endpoints
+                    if e is not exclude and e.has_capacity(now)
+                ]
+                if candidates:
+                    endpoint = min(candidates, key=self.score)
+                    if endpoint.requests_per_minute is not None:
+                        endpoint.tokens -= 1
+                    endpoint.outstanding += 1
+                    endpoint.calls += 1
+                    return endpoint
+            # Every endpoint is at its rate limit, wait for a token to refill
+            time.sleep(0.05)
+
+    def release(self, endpoint: Endpoint, latency: float, error: bool):
+        with self._lock:
+            endpoint.outstanding -= 1
+            now = time.monotonic()
+            error_rate = self.error_rate(endpoint, now)
+            endpoint.error_rate = error_rate + self.alpha * (error - error_rate)
+            endpoint.error_updated_at = now
+            # Failed calls count too, a timing out endpoint is a slow endpoint
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            endpoint.latency += self.alpha * (latency - endpoint.latency)
+
+    def call(self, fn, attempts: int = 2):
+        """Call fn(endpoint) on the best endpoint, retrying on another one if it fails."""
+        endpoint = None
+        for attempt in range(attempts):
+            endpoint = self.acquire(
+                exclude=endpoint if len(self.endpoints) > 1 else None
+            )
+            start = time.monotonic()
+            try:
+                result = fn(endpoint)
+            except Exception:
+                # API errors, or Instructor giving up after its own retries
+                self.release(endpoint, time.monotonic() - start, error=True)
+                if attempt == attempts - 1:
+                    raise
+                continue
+            self.release(endpoint, time.monotonic() - start, error=False)
+            return result
+
+
+# --------------------------------------------------------------
+# Ticket System routed over OpenAI and Azure
+# --------------------------------------------------------------
+
+MODEL = "gpt-3.5-turbo"
+
+endpoints = [
+    Endpoint("openai", OpenAI(max_retries=0), requests_per_minute=3500),
+]
+if os.getenv("AZURE_OPENAI_ENDPOINT"):
+    endpoints.append(
+        Endpoint(
+            "azure",
+            AzureOpenAI(api_version="2024-06-01", max_retries=0),
+            model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-35-turbo"),
+            requests_per_minute=1000,
+        )
+    )
+
+router = Router(endpoints)
+
+
+def validation_retries() -> Retrying:
+    # Only retry invalid outputs on the same endpoint, API errors go back to the router
+    return Retrying(
+        stop=stop_after_attempt(3),
+        retry=retry_if_exception_type((ValidationError, JSONDecodeError)),
+    )
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(BaseModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+def process_ticket(customer_message: str, router: Router = router) -> Ticket:
+    def create(endpoint: Endpoint) -> Ticket:
+        return endpoint.instructor.chat.completions.create(
+            model=endpoint.model or MODEL,
+            response_model=Ticket,
+            max_retries=validation_retries(),
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Analyze the incoming customer message and predict the values for the ticket.",
+                },
+                {"role": "user", "content": customer_message},
+            ],
+        )
+
+    return router.call(create)
+
+
+ticket = process_ticket("Hi there, I have a question about my bill. Can you help me?")
+ticket.category
+
+# --------------------------------------------------------------
+# Text summarization routed over the same endpoints
+# --------------------------------------------------------------
+
+
+class ArticleSummary(BaseModel):
+    invented_year: int
+    summary: str
+    inventors: list[str]
+    description: str
+
+    class Concept(BaseModel):
+        title: str
+        description: str
+
+    concepts: list[Concept]
+
+
+def get_article_summary(text: str, router: Router = router):
+    completion = router.call(
+        lambda endpoint: endpoint.client.beta.chat.completions.parse(
+            model=endpoint.model or "gpt-4o-2024-08-06",
+            temperature=0.2,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Summarize the article following the schema provided.",
+                },
+                {"role": "user", "content": text},
+            ],
+            response_format=ArticleSummary,
+        )
+    )
+
+    return completion.choices[0].message.parsed
+
+
+# --------------------------------------------------------------
+# Benchmark with mock endpoints that have different latency profiles
+# --------------------------------------------------------------
+
+
+class RoundRobin(Router):
+    def __init__(self, endpoints: list[Endpoint]):
+        super().__init__(endpoints)
+        self._cycle = itertools.cycle(endpoints)
+
+    def acquire(self, exclude: Endpoint | None = None) -> Endpoint:
+        with self._lock:
+            endpoint = next(self._cycle)
+            endpoint.outstanding += 1
+            endpoint.calls += 1
+            return endpoint
+
+
+profiles = {
+    "fast": dict(latency=lambda: 0.05),
+    "slow": dict(latency=lambda: 0.4),
+    "flaky": dict(latency=lambda: 0.1, failure_rate=0.3),
+    # E.g. a revoked key or a wrong deployment name
+    "broken": dict(latency=lambda: 0.01, failure_rate=1.0),
+}
+servers = {
+    name: MockChatServer(mock_ticket, **p).start() for name, p in profiles.items()
+}
+
+for strategy in [RoundRobin, Router]:
+    mock_endpoints = [
+        Endpoint(name, OpenAI(base_url=server.url, api_key="mock", max_retries=0))
+        for name, server in servers.items()
+    ]
+    mock_router = strategy(mock_endpoints)
+
+    def handler(message):
+        start = time.perf_counter()
+        try:
+            process_ticket(message, router=mock_router)
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        latencies = list(pool.map(handler, ["I was charged twice."] * 300))
+    elapsed = time.perf_counter() - start
+
+    ok = [latency for latency in latencies if latency is not None]
+    calls = ", ".join(f"{e.name}={e.calls}" for e in mock_endpoints)
+    print(
+        f"{strategy.__name__:>10}: {len(ok) / elapsed:5.1f} tickets/s, "
+        f"mean latency {sum(ok) / len(ok):.3f}s, {len(latencies) - len(ok)} failed ({calls})"
+    )
+    now = time.monotonic()
+    print(
+        "            error rates: "
+        + ", ".join(
+            f"{e.name}={mock_router.error_rate(e, now):.2f}" for e in mock_endpoints
+        )
+    )
+
+for server in servers.values():
+    server.stop()
@@ -0,0 +1,476 @@
+import contextvars
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from enum import Enum
+
+import httpx
+import instructor
+from openai import DefaultHttpxClient, OpenAI
+from pydantic import BaseModel, Field
+
+from mock_server import MockChatServer, mock_ticket
+
+
+# --------------------------------------------------------------
+# Phase-Level Tracing Example
+# --------------------------------------------------------------
+
+"""
+When a structured-output call is slow, we want to know where the time went. The tracer below
+records OpenTelemetry-style spans (trace id, span id, parent, start/end in unix nanoseconds)
+for every phase of a call:
+
+- schema: generating the JSON schema from the Pydantic model
+- attempt: one request to the API, several attempts mean retries
+- serialize: building the request before it reaches the HTTP client
+- transport_retry: the OpenAI client waiting before it resends a failed HTTP request
+- queue: waiting for a free connection in the pool
+- connect / tls: setting up a new connection
+- send: writing the request
+- time_to_first_byte: waiting for the model to respond
+- generation: receiving the response body
+- response_decode: turning the body into a ChatCompletion
+- validate: decoding the JSON arguments and validating the Pydantic model, pydantic does
+  both in a single pass
+
+Spans are passed to pluggable hooks. Without hooks, tracer.span() returns a shared no-op
+context manager and the HTTP hooks return right away, so tracing costs next to nothing.
+"""
+
+# Wall-clock nanoseconds with the precision of perf_counter
+_EPOCH_OFFSET = time.time_ns() - time.perf_counter_ns()
+
+
+def now_ns() -> int:
+    return _EPOCH_OFFSET + time.perf_counter_ns()
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "thread_id",
+        "marks",
+    )
+
+    def __init__(self, name: str, parent=None, start_ns=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = start_ns or now_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.thread_id = threading.get_ident()
+        # Timestamps of HTTP events within this span
+        self.marks = {}
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    def to_otlp(self) -> dict:
+        """The span in the OpenTelemetry (OTLP JSON) layout."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent else "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": [
+                {"key": k, "value": {"stringValue": str(v)}}
+                for k, v in self.attributes.items()
+            ],
+        }
+
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_NOOP = nullcontext()
+
+
+class Tracer:
+    def __init__(self):
+        self.hooks = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.hooks)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def span(self, name: str, **attributes):
+        if not self.hooks:
+            return _NOOP
+        return self._span(name, attributes)
+
+    @contextmanager
+    def _span(self, name: str, attributes: dict):
+        span = Span(name, parent=_current_span.get(), attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = e.__class__.__name__
+            raise
+        finally:
+            span.end_ns = now_ns()
+            _current_span.reset(token)
+            self._emit(span)
+
+    def record(self, name: str, start_ns: int, end_ns: int, parent=None, **attributes):
+        """Record a span that already happened, e.g. from HTTP event timestamps."""
+        span = Span(name, parent or _current_span.get(), start_ns, attributes)
+        span.end_ns = end_ns
+        self._emit(span)
+
+    def _emit(self, span: Span):
+        for hook in self.hooks:
+            hook.on_end(span)
+
+
+tracer = Tracer()
+
+
+# --------------------------------------------------------------
+# Instrumentation: models, client and HTTP events
+# --------------------------------------------------------------
+
+
+class TracedModel(BaseModel):
+    """Base model that traces schema generation and validation."""
+
+    @classmethod
+    def model_json_schema(cls, *args, **kwargs):
+        with tracer.span("schema", model=cls.__name__):
+            return super().model_json_schema(*args, **kwargs)
+
+    @classmethod
+    def model_validate_json(cls, json_data, *, strict=None, context=None):
+        # Splitting decode and validation would change the rules, e.g. strict mode accepts
+        # strings for enums in JSON, but not in Python data
+        with tracer.span("validate", model=cls.__name__, includes_decode=True):
+            return super().model_validate_json(
+                json_data, strict=strict, context=context
+            )
+
+
+# httpcore reports these events with a .started and a .complete suffix
+HTTP_PHASES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+    "http11.send_request_headers": "send",
+    "http11.send_request_body": "send",
+    "http11.receive_response_headers": "time_to_first_byte",
+    "http11.receive_response_body": "generation",
+}
+
+
+def on_request(request: httpx.Request):
+    span = _current_span.get()
+    if not tracer.enabled or span is None:
+        return
+    sent_at = now_ns()
+    number = span.marks.get("requests", 0) + 1
+    span.marks["requests"] = number
+    if number == 1:
+        tracer.record("serialize", span.start_ns, sent_at, parent=span)
+    else:
+        # The OpenAI client resends the request, e.g. after a 503 or a connection error
+        tracer.record("transport_retry", span.marks["last_event"], sent_at, parent=span)
+    span.marks["last_event"] = sent_at
+    # Event timestamps of this HTTP request only
+    marks = {"request": sent_at}
+
+    def trace(event_name: str, info: dict):
+        prefix, _, stage = event_name.rpartition(".")
+        now = now_ns()
+        span.marks["last_event"] = now
+        if "queued" not in marks:
+            # The first event after the request hook means we got a connection
+            marks["queued"] = now
+            tracer.record("queue", sent_at, now, parent=span, request=number)
+        if stage == "started":
+            marks[prefix] = now
+        elif prefix in HTTP_PHASES and prefix in marks:
+            tracer.record(
+                HTTP_PHASES[prefix], marks[prefix], now, parent=span, request=number
+            )
+            if prefix == "http11.receive_response_body":
+                span.marks["body_received"] = now
+
+    request.extensions["trace"] = trace
+
+
+def traced_openai(**kwargs) -> OpenAI:
+    client = OpenAI(
+        http_client=DefaultHttpxClient(event_hooks={"request": [on_request]}), **kwargs
+    )
+    create = client.chat.completions.create
+
+    def traced_create(*args, **create_kwargs):
+        with tracer.span("attempt", model=create_kwargs.get("model")) as span:
+            completion = create(*args, **create_kwargs)
+            if span is not None and "body_received" in span.marks:
+                tracer.record("response_decode", span.marks["body_received"], now_ns())
+            return completion
+
+    # Instructor and client.beta.chat.completions.parse both call this method
+    client.chat.completions.create = traced_create
+    return client
+
+
+# --------------------------------------------------------------
+# Exporters
+# --------------------------------------------------------------
+
+
+class ChromeTraceExporter:
+    """Writes Chrome trace events, open the file in https://ui.perfetto.dev or speedscope."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events = []
+
+    def on_end(self, span: Span):
+        self.events.append(
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": span.duration_ns / 1000,
+                "pid": os.getpid(),
+                "tid": span.thread_id,
+                "args": {**span.attributes, "trace_id": span.trace_id},
+            }
+        )
+
+    def close(self):
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": self.events}, f)
+
+
+class FoldedStackExporter:
+    """Writes folded stacks (self time in microseconds) for flamegraph.pl or speedscope."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.self_time = defaultdict(int)
+        self.children_time = defaultdict(int)
+        self.spans = []
+
+    def on_end(self, span: Span):
+        self.spans.append(span)
+        if span.parent is not None:
+            self.children_time[span.parent.span_id] += span.duration_ns
+
+    def close(self):
+        stacks = defaultdict(int)
+        for span in self.spans:
+            names, parent = [span.name], span.parent
+            while parent is not None:
+                names.append(parent.name)
+                parent = parent.parent
+            self_ns = span.duration_ns - self.children_time[span.span_id]
+            stacks[";".join(reversed(names))] += max(self_ns, 0) // 1000
+        with open(self.path, "w") as f:
+            f.writelines(f"{stack} {us}\n" for stack, us in stacks.items() if us)
+
+
+class PhaseSummary:
+    """Aggregates the total time per phase, handy for a quick look in the terminal."""
+
+    def __init__(self):
+        self.totals = defaultdict(int)
+        self.counts = defaultdict(int)
+
+    def on_end(self, span: Span):
+        self.totals[span.name] += span.duration_ns
+        self.counts[span.name] += 1
+
+    def print(self):
+        for name, total in sorted(self.totals.items(), key=lambda item: -item[1]):
+            count = self.counts[name]
+            print(
+                f"{name:>20}: {count:5d} spans, total {total / 1e6:9.1f} ms, "
+                f"mean {total / count / 1e6:7.2f} ms"
+            )
+
+
+class OpenTelemetryHook:
+    """Forwards spans to an OpenTelemetry tracer (requires the opentelemetry-sdk package)."""
+
+    def __init__(self, name: str = "structured-output"):
+        from opentelemetry import trace
+
+        self.trace = trace
+        self.tracer = trace.get_tracer(name)
+        self.pending = defaultdict(list)
+
+    def on_end(self, span: Span):
+        # Children end before their parents, so replay a trace once its root span ends
+        self.pending[span.trace_id].append(span)
+        if span.parent is None:
+            spans = self.pending.pop(span.trace_id)
+            # Parents start no later and end no earlier than their children
+            self._replay(sorted(spans, key=lambda s: (s.start_ns, -s.end_ns)))
+
+    def _replay(self, spans: list[Span]):
+        contexts = {}
+        for span in spans:
+            parent = contexts.get(span.parent.span_id) if span.parent else None
+            otel_span = self.tracer.start_span(
+                span.name,
+                context=self.trace.set_span_in_context(parent) if parent else None,
+                start_time=span.start_ns,
+                attributes={k: str(v) for k, v in span.attributes.items()},
+            )
+            otel_span.end(end_time=span.end_ns)
+            contexts[span.span_id] = otel_span
+
+
+# --------------------------------------------------------------
+# Tracing the Ticket System
+# --------------------------------------------------------------
+
+openai_client = traced_openai()
+client = instructor.from_openai(openai_client)
+
+
+class TicketCategory(str, Enum):
+    """Enumeration of categories for incoming tickets."""
+
+    GENERAL = "general"
+    ORDER = "order"
+    BILLING = "billing"
+
+
+class CustomerSentiment(str, Enum):
+    """Enumeration of customer sentiment labels."""
+
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    POSITIVE = "positive"
+
+
+class Ticket(TracedModel):
+    reply: str = Field(description="Your reply that we send to the customer.")
+    category: TicketCategory
+    confidence: float = Field(ge=0, le=1)
+    sentiment: CustomerSentiment
+
+
+def process_ticket(customer_message: str, client=client) -> Ticket:
+    with tracer.span("process_ticket"):
+        reply = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            response_model=Ticket,
+            max_retries=3,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Analyze the incoming customer message and predict the values for the ticket.",
+                },
+                {"role": "user", "content": customer_message},
+            ],
+        )
+
+    return reply
+
+
+summary = PhaseSummary()
+tracer.add_hook(summary)
+
+ticket = process_ticket("Hi there, I have a question about my bill. Can you help me?")
+
+# --------------------------------------------------------------
+# Tracing client.beta.chat.completions.parse
+# --------------------------------------------------------------
+
+
+class TicketResolution(TracedModel):
+    class Step(TracedModel):
+        description: str = Field(description="Description of the step taken.")
+        action: str = Field(description="Action taken to resolve the issue.")
+
+    steps: list[Step]
+    final_resolution: str = Field(
+        description="The final message that will be send to the customer."
+    )
+    confidence: float = Field(description="Confidence in the resolution (0-1)")
+
+
+def get_ticket_response_pydantic(query: str, client=openai_client):
+    with tracer.span("get_ticket_response"):
+        completion = client.beta.chat.completions.parse(
+            model="gpt-4o-2024-08-06",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an AI customer care assistant. Respond with a structured solution.",
+                },
+                {"role": "user", "content": query},
+            ],
+            response_format=TicketResolution,
+        )
+
+    return completion.choices[0].message.parsed
+
+
+response = get_ticket_response_pydantic("I received the wrong item, can I return it?")
+summary.print()
+
+# --------------------------------------------------------------
+# Profiling the full pipeline offline against a mock server
+# --------------------------------------------------------------
+
+
+# Seeded, so every run of the profile sees the same retries
+rng = random.Random(42)
+
+
+def flaky_ticket(request: dict) -> dict:
+    # About one in ten answers fails validation, which shows up as retries in the trace
+    if rng.random() < 0.1:
+        return {"reply": "Sure!", "category": "banana", "confidence": 85}
+    return mock_ticket(request)
+
+
+os.makedirs("traces", exist_ok=True)
+tracer = Tracer()
+summary = PhaseSummary()
+chrome = ChromeTraceExporter("traces/process_ticket.json")
+folded = FoldedStackExporter("traces/process_ticket.folded")
+for hook in (summary, chrome, folded):
+    tracer.add_hook(hook)
+
+with MockChatServer(flaky_ticket, latency=lambda: random.uniform(0.05, 0.2)) as server:
+    mock_client = instructor.from_openai(
+        traced_openai(base_url=server.url, api_key="mock")
+    )
+    for _ in range(50):
+        process_ticket("I was charged twice on my bill.", client=mock_client)
+
+chrome.close()
+folded.close()
+summary.print()
+
+# Overhead of a disabled tracer
+disabled = Tracer()
+start = time.perf_counter()
+for _ in range(1_000_000):
+    with disabled.span("noop"):
+        pass
+print(f"Disabled span: {(time.perf_counter() - start) * 1000:.0f} ns per call")
@@ -0,0 +1,154 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# --------------------------------------------------------------
+# Local stand-in for the chat completions endpoint
+# --------------------------------------------------------------
+
+"""
+A tiny OpenAI-compatible server used by the benchmark and fault-injection examples.
+Point a client at it with OpenAI(base_url=server.url, api_key="mock").
+
+- payload(request) returns the dict the "model" produces for one choice
+- latency() returns the number of seconds to wait before responding
+- failure_rate is the share of requests answered with HTTP 503
+"""
+
+
+def pareto_latency(scale: float = 0.05, alpha: float = 1.5, cap: float = 10.0):
+    """Heavy-tailed latency: most calls are fast, a few stall for a long time."""
+    return lambda: min(scale * random.paretovariate(alpha), cap)
+
+
+def mock_ticket(request: dict) -> dict:
+    """A valid Ticket payload, for examples that only need the model to answer."""
+    return {
+        "reply": "Happy to help with your bill!",
+        "category": "billing",
+        "confidence": 0.9,
+        "sentiment": "neutral",
+    }
+
+
+class MockChatServer:
+    def __init__(self, payload, latency=None, failure_rate: float = 0.0, port: int = 0):
+        self.payload = payload
+        self.latency = latency or (lambda: 0.0)
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def completion(self, request: dict) -> dict:
+        choices = []
+        for index in range(request.get("n") or 1):
+            arguments = json.dumps(self.payload(request))
+            if request.get("tools"):
+                name = request["tools"][0]["function"]["name"]
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": f"call_{uuid.uuid4().hex[:12]}",
+                            "type": "function",
+                            "function": {"name": name, "arguments": arguments},
+                        }
+                    ],
+                }
+            else:
+                message = {"role": "assistant", "content": arguments}
+            choices.append(
+                {
+                    "index": index,
+                    "message": message,
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }
+            )
+
+        prompt = sum(
+            len(str(m.get("content", ""))) for m in request.get("messages", [])
+        )
+        completion = sum(len(json.dumps(c["message"])) for c in choices)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": choices,
+            # Rough estimate of ~4 characters per token
+            "usage": {
+                "prompt_tokens": prompt // 4,
+                "completion_tokens": completion // 4,
+                "total_tokens": (prompt + completion) // 4,
+            },
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+
+                time.sleep(server.latency())
+
+                if random.random() < server.failure_rate:
+                    body = {
+                        "error": {
+                            "message": "Service unavailable",
+                            "type": "server_error",
+                        }
+                    }
+                    self._send(503, body)
+                    return
+                self._send(200, server.completion(request))
+
+            def _send(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on this request (e.g. a cancelled hedge)
+                    pass
+
+        return Handler